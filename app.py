@@ -1,6 +1,16 @@
+import base64
+import mmap
+import os
+from pathlib import Path
+
 import streamlit as st
 import streamlit.components.v1 as components
 
+from trace_format import TRACE_BLOCK_SIZE, index_trace, trace_window
+
+# Offline traces are only read from this directory
+TRACE_DIR = Path(os.environ.get("MINIMAX_TRACE_DIR", Path(__file__).parent / "traces"))
+
 # Page configuration
 st.set_page_config(
     page_title="Minimax Alpha-Beta Visualizer",
@@ -35,6 +45,16 @@ with st.sidebar:
     When β ≤ α, we can prune that branch.
     """)
 
+    st.header("Offline Replay")
+    trace_files = sorted(p.name for p in TRACE_DIR.glob("*.mmvt")) if TRACE_DIR.is_dir() else []
+    trace_name = st.selectbox(
+        "Trace file",
+        [""] + trace_files,
+        help="A .mmvt trace from the server's trace directory (MINIMAX_TRACE_DIR). "
+             "It is replayed without re-running the search."
+    )
+    trace_path = TRACE_DIR / trace_name if trace_name else None
+
 # The HTML code for the visualization
 html_code = """
 <!DOCTYPE html>
@@ -244,6 +264,34 @@ html_code = """
             color: var(--color-text-secondary);
             margin-top: var(--space-8);
         }
+
+        .profiling {
+            margin-top: var(--space-16);
+            background: var(--color-surface);
+            padding: var(--space-20);
+            border-radius: var(--radius-lg);
+            border: 1px solid var(--color-card-border);
+        }
+
+        .profiling h3 {
+            font-size: var(--font-size-lg);
+            font-weight: 600;
+            margin-bottom: var(--space-12);
+        }
+
+        .profiling .stats {
+            margin-top: 0;
+            padding: 0;
+            border: none;
+            margin-bottom: var(--space-16);
+        }
+
+        .phase-times {
+            font-family: monospace;
+            font-size: var(--font-size-sm);
+            color: var(--color-text-secondary);
+            margin-bottom: var(--space-16);
+        }
     </style>
 </head>
 <body>
@@ -258,6 +306,10 @@ html_code = """
         <div class="input-group">
             <label for="treeValues">Leaf Values (comma-separated):</label>
             <input type="text" id="treeValues" value="3, 12, 8, 2, 4, 6, 14, 5, 2, 1, 9, 11, 7, 10, 4, 13">
+            <button id="exportTrace" class="secondary" disabled>Export Trace</button>
+            <button id="importTrace" class="secondary">Import Trace</button>
+            <input type="file" id="traceFile" accept=".mmvt" hidden>
+            <label><input type="checkbox" id="compressTrace" checked> Compress</label>
         </div>
     </div>
 
@@ -307,6 +359,33 @@ html_code = """
         </div>
     </div>
 
+    <div class="profiling">
+        <h3>Profiling</h3>
+        <div class="stats">
+            <div class="stat-item">
+                <div class="stat-value" id="nodesPerSec">-</div>
+                <div class="stat-label">Nodes / sec</div>
+            </div>
+            <div class="stat-item">
+                <div class="stat-value" id="traceBytes">-</div>
+                <div class="stat-label">Trace Size (uncompressed)</div>
+            </div>
+            <div class="stat-item">
+                <div class="stat-value" id="frameTimes">-</div>
+                <div class="stat-label">Frame p50 / p95 (ms)</div>
+            </div>
+            <div class="stat-item">
+                <div class="stat-value" id="allocations">-</div>
+                <div class="stat-label">Nodes / Steps Allocated</div>
+            </div>
+        </div>
+        <div class="phase-times" id="phaseTimes">-</div>
+        <div class="button-group">
+            <button id="exportProfile" class="secondary">Export Profile (JSON)</button>
+            <button id="exportChromeTrace" class="secondary">Export Chrome Trace</button>
+        </div>
+    </div>
+
     <script>
         const canvas = document.getElementById('treeCanvas');
         const ctx = canvas.getContext('2d');
@@ -316,16 +395,546 @@ html_code = """
         let animationSteps = [];
         let currentStep = 0;
         let isAnimating = false;
+        let leafValues = [];
+        let traceIsAlphaBeta = false;
+        let traceLoading = false;
+        let importGeneration = 0;
+        const OFFLINE_TRACE = null;
+
+        // Per-phase timers and counters for the profiling panel
+        const PHASES = ['build', 'search', 'load', 'layout', 'draw'];
+        const MAX_TRACE_EVENTS = 10000;
+        let perf = null;
+
+        function resetPerf() {
+            perf = {
+                phases: {},
+                events: [],
+                frameTimes: [],
+                traceBytes: 0,
+                blockSteps: 0,
+                blockBytes: 0,
+                lastNodeId: 0,
+                nodesVisited: 0,
+                nodesAllocated: 0,
+                stepsAllocated: 0
+            };
+            for (let phase of PHASES) {
+                perf.phases[phase] = { total: 0, calls: 0 };
+            }
+        }
+
+        function recordPhase(name, start, duration) {
+            const phase = perf.phases[name];
+            phase.total += duration;
+            phase.calls++;
+            if (perf.events.length < MAX_TRACE_EVENTS) {
+                perf.events.push({
+                    name: name,
+                    cat: 'visualizer',
+                    ph: 'X',
+                    ts: Math.round(start * 1000),
+                    dur: Math.round(duration * 1000),
+                    pid: 1,
+                    tid: 1
+                });
+            }
+        }
+
+        function timed(name, fn) {
+            const start = performance.now();
+            const result = fn();
+            recordPhase(name, start, performance.now() - start);
+            return result;
+        }
+
+        function percentile(sorted, p) {
+            if (sorted.length === 0) return 0;
+            const index = Math.min(sorted.length - 1, Math.floor(p / 100 * sorted.length));
+            return sorted[index];
+        }
+
+        // Searches and imports record their trace through here so the counters stay
+        // current without another pass over the steps. Trace size is the length of
+        // the uncompressed .mmvt export: traceBytes holds the header, leaves and
+        // finished blocks, and the open block is framed in encodedTraceSize().
+        function emitStep(steps, step) {
+            steps.push(step);
+            perf.stepsAllocated++;
+            if (step.type === 'visit') perf.nodesVisited++;
+            perf.blockBytes += encodedStepSize(step, perf.lastNodeId);
+            perf.lastNodeId = step.node.id;
+            if (++perf.blockSteps === TRACE_BLOCK_SIZE) {
+                perf.traceBytes += encodedBlockSize(perf.blockSteps, perf.blockBytes);
+                perf.blockSteps = 0;
+                perf.blockBytes = 0;
+            }
+        }
+
+        function encodedTraceSize() {
+            const openBlock = perf.blockSteps > 0 ? encodedBlockSize(perf.blockSteps, perf.blockBytes) : 0;
+            return perf.traceBytes + openBlock + 1;
+        }
+
+        function runSearch(search) {
+            timed('search', search);
+        }
+
+        function profileSummary() {
+            const sorted = perf.frameTimes.slice().sort((a, b) => a - b);
+            const searchTime = perf.phases.search.total;
+            return {
+                phases: perf.phases,
+                nodesVisited: perf.nodesVisited,
+                nodesPerSec: searchTime > 0 ? Math.round(perf.nodesVisited / (searchTime / 1000)) : null,
+                traceBytes: encodedTraceSize(),
+                frames: {
+                    count: sorted.length,
+                    p50: percentile(sorted, 50),
+                    p95: percentile(sorted, 95),
+                    p99: percentile(sorted, 99)
+                },
+                allocations: {
+                    nodes: perf.nodesAllocated,
+                    steps: perf.stepsAllocated
+                }
+            };
+        }
+
+        function formatBytes(bytes) {
+            if (bytes < 1024) return bytes + ' B';
+            if (bytes < 1024 * 1024) return (bytes / 1024).toFixed(1) + ' KB';
+            return (bytes / (1024 * 1024)).toFixed(1) + ' MB';
+        }
+
+        function updateProfile() {
+            const summary = profileSummary();
+            document.getElementById('nodesPerSec').textContent =
+                summary.nodesPerSec !== null ? summary.nodesPerSec.toLocaleString() : '-';
+            document.getElementById('traceBytes').textContent =
+                summary.allocations.steps > 0 ? formatBytes(summary.traceBytes) : '-';
+            document.getElementById('frameTimes').textContent = summary.frames.count > 0
+                ? `${summary.frames.p50.toFixed(2)} / ${summary.frames.p95.toFixed(2)}`
+                : '-';
+            document.getElementById('allocations').textContent =
+                `${summary.allocations.nodes} / ${summary.allocations.steps}`;
+            document.getElementById('phaseTimes').textContent = PHASES
+                .map(name => `${name}: ${summary.phases[name].total.toFixed(2)} ms`)
+                .join(' · ');
+        }
+
+        function downloadBlob(filename, blob) {
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(blob);
+            link.download = filename;
+            link.click();
+            URL.revokeObjectURL(link.href);
+        }
+
+        function downloadJSON(filename, data) {
+            downloadBlob(filename, new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' }));
+        }
+
+        // Binary trace format (.mmvt), version 1
+        //
+        //   header   'MMVT', u8 version, u8 flags, u16 reserved (zero)
+        //   leaves   varint byte length, then varint count and zigzag varint values
+        //   blocks   varint step count (0 ends the trace), varint byte length, then
+        //            columns, deflate-compressed per block when FLAG_COMPRESSED is set:
+        //              types    one byte per step (type | maximizing | has bounds)
+        //              nodes    zigzag varint delta from the previous step's node id
+        //              values   number per backtrack step
+        //              alphas   number per step with bounds
+        //              betas    number per step with bounds
+        //
+        // Numbers are varints with -∞ as 0, +∞ as 1 and integers zigzagged from 2.
+        // Every block is length-prefixed and compressed on its own, so a trace can be
+        // indexed without decoding it and replayed while later blocks are still decoding.
+        const TRACE_MAGIC = [0x4d, 0x4d, 0x56, 0x54];
+        const TRACE_VERSION = 1;
+        const TRACE_HEADER_SIZE = 8;
+        const TRACE_BLOCK_SIZE = 4096;
+        const FLAG_COMPRESSED = 1;
+        const FLAG_ALPHA_BETA = 2;
+        const TRACE_FLAGS = FLAG_COMPRESSED | FLAG_ALPHA_BETA;
+        const STEP_TYPES = ['visit', 'backtrack', 'prune'];
+        const STEP_TYPE_MASK = 3;
+        const STEP_MAXIMIZING = 4;
+        const STEP_HAS_BOUNDS = 8;
+        const STEP_FLAGS = STEP_TYPE_MASK | STEP_MAXIMIZING | STEP_HAS_BOUNDS;
+
+        function zigzagCode(n) {
+            return n >= 0 ? n * 2 : -n * 2 - 1;
+        }
+
+        function numberCode(n) {
+            if (n === -Infinity) return 0;
+            if (n === Infinity) return 1;
+            return zigzagCode(n) + 2;
+        }
+
+        function varintSize(n) {
+            let size = 1;
+            while (n >= 0x80) {
+                n = Math.floor(n / 0x80);
+                size++;
+            }
+            return size;
+        }
+
+        function encodedLeavesSize(values) {
+            let size = varintSize(values.length);
+            for (let value of values) {
+                size += varintSize(zigzagCode(value));
+            }
+            return varintSize(size) + size;
+        }
+
+        function encodedBlockSize(stepCount, payloadBytes) {
+            return varintSize(stepCount) + varintSize(payloadBytes) + payloadBytes;
+        }
+
+        function encodedStepSize(step, previousId) {
+            let size = 1 + varintSize(zigzagCode(step.node.id - previousId));
+            if (step.type === 'backtrack') size += varintSize(numberCode(step.value));
+            if ('alpha' in step) size += varintSize(numberCode(step.alpha)) + varintSize(numberCode(step.beta));
+            return size;
+        }
+
+        class ByteWriter {
+            constructor() {
+                this.bytes = new Uint8Array(1024);
+                this.length = 0;
+            }
+
+            reserve(n) {
+                if (this.length + n > this.bytes.length) {
+                    let size = this.bytes.length * 2;
+                    while (this.length + n > size) size *= 2;
+                    const grown = new Uint8Array(size);
+                    grown.set(this.bytes);
+                    this.bytes = grown;
+                }
+            }
+
+            byte(b) {
+                this.reserve(1);
+                this.bytes[this.length++] = b;
+            }
+
+            append(bytes) {
+                this.reserve(bytes.length);
+                this.bytes.set(bytes, this.length);
+                this.length += bytes.length;
+            }
+
+            varint(n) {
+                while (n >= 0x80) {
+                    this.byte((n % 0x80) | 0x80);
+                    n = Math.floor(n / 0x80);
+                }
+                this.byte(n);
+            }
+
+            zigzag(n) {
+                this.varint(zigzagCode(n));
+            }
+
+            number(n) {
+                this.varint(numberCode(n));
+            }
+
+            result() {
+                return this.bytes.subarray(0, this.length);
+            }
+        }
+
+        class ByteReader {
+            constructor(bytes) {
+                this.bytes = bytes;
+                this.offset = 0;
+            }
+
+            byte() {
+                if (this.offset >= this.bytes.length) {
+                    throw new Error('Trace file is truncated');
+                }
+                return this.bytes[this.offset++];
+            }
+
+            varint() {
+                let n = 0;
+                let scale = 1;
+                let b;
+                do {
+                    b = this.byte();
+                    n += (b & 0x7f) * scale;
+                    scale *= 0x80;
+                } while (b & 0x80);
+                return n;
+            }
+
+            zigzag() {
+                const n = this.varint();
+                return n % 2 === 0 ? n / 2 : -(n + 1) / 2;
+            }
+
+            number() {
+                const n = this.varint();
+                if (n === 0) return -Infinity;
+                if (n === 1) return Infinity;
+                return (n - 2) % 2 === 0 ? (n - 2) / 2 : -(n - 1) / 2;
+            }
+        }
+
+        async function transform(bytes, stream) {
+            const response = new Response(new Blob([bytes]).stream().pipeThrough(stream));
+            return new Uint8Array(await response.arrayBuffer());
+        }
+
+        async function encodeTrace(values, steps, isAlphaBeta, compress) {
+            for (let value of values) {
+                if (!Number.isInteger(value)) {
+                    throw new Error('Leaf values must be integers to export a trace');
+                }
+            }
+            compress = compress && typeof CompressionStream !== 'undefined';
+
+            const out = new ByteWriter();
+            out.append(TRACE_MAGIC);
+            out.byte(TRACE_VERSION);
+            out.byte((compress ? FLAG_COMPRESSED : 0) | (isAlphaBeta ? FLAG_ALPHA_BETA : 0));
+            out.byte(0);
+            out.byte(0);
+
+            const leaves = new ByteWriter();
+            leaves.varint(values.length);
+            for (let value of values) {
+                leaves.zigzag(value);
+            }
+            out.varint(leaves.length);
+            out.append(leaves.result());
+
+            let previousId = 0;
+            for (let start = 0; start < steps.length; start += TRACE_BLOCK_SIZE) {
+                const block = steps.slice(start, start + TRACE_BLOCK_SIZE);
+                const columns = new ByteWriter();
+                for (let step of block) {
+                    columns.byte(STEP_TYPES.indexOf(step.type) |
+                        (step.isMaximizing ? STEP_MAXIMIZING : 0) |
+                        ('alpha' in step ? STEP_HAS_BOUNDS : 0));
+                }
+                for (let step of block) {
+                    columns.zigzag(step.node.id - previousId);
+                    previousId = step.node.id;
+                }
+                for (let step of block) {
+                    if (step.type === 'backtrack') columns.number(step.value);
+                }
+                for (let step of block) {
+                    if ('alpha' in step) columns.number(step.alpha);
+                }
+                for (let step of block) {
+                    if ('alpha' in step) columns.number(step.beta);
+                }
+
+                const payload = compress
+                    ? await transform(columns.result(), new CompressionStream('deflate'))
+                    : columns.result();
+                out.varint(block.length);
+                out.varint(payload.length);
+                out.append(payload);
+            }
+            out.varint(0);
+            return out.result();
+        }
+
+        function openTrace(bytes) {
+            if (bytes.length < TRACE_HEADER_SIZE ||
+                TRACE_MAGIC.some((b, i) => bytes[i] !== b)) {
+                throw new Error('Not a minimax trace file');
+            }
+            if (bytes[4] !== TRACE_VERSION) {
+                throw new Error(`Unsupported trace version ${bytes[4]} (expected ${TRACE_VERSION})`);
+            }
+            const flags = bytes[5];
+            if ((flags & ~TRACE_FLAGS) !== 0) {
+                throw new Error(`Unknown trace flags ${flags}`);
+            }
+            if (bytes[6] !== 0 || bytes[7] !== 0) {
+                throw new Error('Trace header reserved bytes must be zero');
+            }
+
+            const reader = new ByteReader(bytes);
+            reader.offset = TRACE_HEADER_SIZE;
+            const leaves = new ByteReader(readSection(reader));
+            const values = [];
+            const leafCount = leaves.varint();
+            if (leafCount < 2) {
+                throw new Error('Trace tree needs at least two leaves');
+            }
+            for (let i = 0; i < leafCount; i++) {
+                values.push(leaves.zigzag());
+            }
+            if (leaves.offset !== leaves.bytes.length) {
+                throw new Error('Trace leaf section is corrupt');
+            }
+
+            return {
+                values,
+                reader,
+                compressed: (flags & FLAG_COMPRESSED) !== 0,
+                isAlphaBeta: (flags & FLAG_ALPHA_BETA) !== 0
+            };
+        }
+
+        function readSection(reader) {
+            const length = reader.varint();
+            const end = reader.offset + length;
+            if (end > reader.bytes.length) {
+                throw new Error('Trace file is truncated');
+            }
+            const section = reader.bytes.subarray(reader.offset, end);
+            reader.offset = end;
+            return section;
+        }
+
+        // Decodes one block at a time, yielding steps that reference node ids
+        async function* traceBlocks(trace) {
+            const reader = trace.reader;
+            let previousId = 0;
+            let blockLength;
+            while ((blockLength = reader.varint()) > 0) {
+                const start = performance.now();
+                let payload = readSection(reader);
+                if (trace.compressed) {
+                    payload = await transform(payload, new DecompressionStream('deflate'));
+                }
+
+                const columns = new ByteReader(payload);
+                const block = [];
+                for (let i = 0; i < blockLength; i++) {
+                    const bits = columns.byte();
+                    const type = STEP_TYPES[bits & STEP_TYPE_MASK];
+                    if (!type || (bits & ~STEP_FLAGS) !== 0) {
+                        throw new Error(`Unknown trace step ${bits}`);
+                    }
+                    const step = { node: null, type: type };
+                    if (type === 'visit') step.isMaximizing = (bits & STEP_MAXIMIZING) !== 0;
+                    step.hasBounds = (bits & STEP_HAS_BOUNDS) !== 0;
+                    block.push(step);
+                }
+                for (let step of block) {
+                    previousId += columns.zigzag();
+                    step.node = previousId;
+                }
+                for (let step of block) {
+                    if (step.type === 'backtrack') step.value = columns.number();
+                }
+                for (let step of block) {
+                    if (step.hasBounds) step.alpha = columns.number();
+                }
+                for (let step of block) {
+                    if (step.hasBounds) step.beta = columns.number();
+                    delete step.hasBounds;
+                }
+                if (columns.offset !== payload.length) {
+                    throw new Error('Trace block is corrupt');
+                }
+
+                recordPhase('load', start, performance.now() - start);
+                yield block;
+            }
+            if (reader.offset !== reader.bytes.length) {
+                throw new Error('Trace file has trailing data');
+            }
+        }
+
+        function collectNodes(root) {
+            const nodes = [];
+            const stack = [root];
+            while (stack.length > 0) {
+                const node = stack.pop();
+                nodes[node.id] = node;
+                for (let child of node.children) {
+                    stack.push(child);
+                }
+            }
+            return nodes;
+        }
+
+        function applyStep(step) {
+            const node = step.node;
+            if (step.type === 'visit') {
+                node.alpha = step.alpha;
+                node.beta = step.beta;
+                if (node.isLeaf) node.visited = true;
+            } else if (step.type === 'backtrack') {
+                node.value = step.value;
+                node.visited = true;
+            } else if (step.type === 'prune') {
+                node.pruned = true;
+            }
+        }
+
+        // Replay starts after the first block; later blocks are appended while it plays
+        async function importTrace(bytes) {
+            const trace = openTrace(bytes);
+            treeValuesInput.value = trace.values.join(', ');
+            initializeTree();
+
+            const generation = importGeneration;
+            const nodes = collectNodes(tree);
+            let started = false;
+            traceLoading = true;
+            try {
+                for await (const block of traceBlocks(trace)) {
+                    // Stop appending if another run or import has replaced the tree
+                    if (generation !== importGeneration) return;
+                    for (let step of block) {
+                        step.node = nodes[step.node];
+                        if (!step.node) {
+                            throw new Error('Trace does not match its tree');
+                        }
+                        applyStep(step);
+                        emitStep(animationSteps, step);
+                    }
+                    if (!started) {
+                        started = true;
+                        startAnimation(trace.isAlphaBeta);
+                    }
+                    await new Promise(resolve => setTimeout(resolve));
+                }
+            } finally {
+                if (generation === importGeneration) traceLoading = false;
+            }
+            if (!started) {
+                startAnimation(trace.isAlphaBeta);
+            }
+        }
+
+        function base64ToBytes(text) {
+            const binary = atob(text);
+            const bytes = new Uint8Array(binary.length);
+            for (let i = 0; i < binary.length; i++) {
+                bytes[i] = binary.charCodeAt(i);
+            }
+            return bytes;
+        }
 
         class TreeNode {
             constructor(value = null, isLeaf = false) {
+                perf.nodesAllocated++;
+                this.id = 0;
                 this.value = value;
                 this.isLeaf = isLeaf;
                 this.children = [];
                 this.alpha = -Infinity;
                 this.beta = Infinity;
                 this.visited = false;
+                // Set only on the root of a pruned subtree; descendants inherit it
                 this.pruned = false;
+                this.size = 1;
                 this.isBestPath = false;
                 this.x = 0;
                 this.y = 0;
@@ -341,6 +950,7 @@ html_code = """
             const queue = [root];
             const levels = Math.ceil(Math.log2(leafCount)) + 1;
             let leafIndex = 0;
+            let nextId = 1;
             
             while (queue.length > 0 && leafIndex < leafCount) {
                 const node = queue.shift();
@@ -348,6 +958,7 @@ html_code = """
                 if (node.depth === levels - 2) {
                     for (let i = 0; i < 2 && leafIndex < leafCount; i++) {
                         const leaf = new TreeNode(values[leafIndex], true);
+                        leaf.id = nextId++;
                         leaf.depth = node.depth + 1;
                         node.children.push(leaf);
                         leafIndex++;
@@ -355,6 +966,7 @@ html_code = """
                 } else {
                     for (let i = 0; i < 2; i++) {
                         const child = new TreeNode();
+                        child.id = nextId++;
                         child.depth = node.depth + 1;
                         node.children.push(child);
                         queue.push(child);
@@ -362,11 +974,20 @@ html_code = """
                 }
             }
             
+            computeSubtreeSizes(root);
             return root;
         }
 
+        function computeSubtreeSizes(node) {
+            node.size = 1;
+            for (let child of node.children) {
+                node.size += computeSubtreeSizes(child);
+            }
+            return node.size;
+        }
+
         function minimax(node, depth, isMaximizing, steps) {
-            steps.push({
+            emitStep(steps, {
                 node: node,
                 type: 'visit',
                 isMaximizing: isMaximizing,
@@ -387,7 +1008,7 @@ html_code = """
                 }
                 node.value = maxVal;
                 node.visited = true;
-                steps.push({
+                emitStep(steps, {
                     node: node,
                     type: 'backtrack',
                     value: maxVal
@@ -401,7 +1022,7 @@ html_code = """
                 }
                 node.value = minVal;
                 node.visited = true;
-                steps.push({
+                emitStep(steps, {
                     node: node,
                     type: 'backtrack',
                     value: minVal
@@ -414,7 +1035,7 @@ html_code = """
             node.alpha = alpha;
             node.beta = beta;
             
-            steps.push({
+            emitStep(steps, {
                 node: node,
                 type: 'visit',
                 isMaximizing: isMaximizing,
@@ -429,15 +1050,15 @@ html_code = """
             
             if (isMaximizing) {
                 let maxVal = -Infinity;
-                for (let child of node.children) {
-                    const val = alphaBeta(child, depth + 1, alpha, beta, false, steps);
+                for (let c = 0; c < node.children.length; c++) {
+                    const val = alphaBeta(node.children[c], depth + 1, alpha, beta, false, steps);
                     maxVal = Math.max(maxVal, val);
                     alpha = Math.max(alpha, val);
                     
                     if (beta <= alpha) {
-                        for (let i = node.children.indexOf(child) + 1; i < node.children.length; i++) {
-                            markPruned(node.children[i]);
-                            steps.push({
+                        for (let i = c + 1; i < node.children.length; i++) {
+                            node.children[i].pruned = true;
+                            emitStep(steps, {
                                 node: node.children[i],
                                 type: 'prune',
                                 alpha: alpha,
@@ -449,7 +1070,7 @@ html_code = """
                 }
                 node.value = maxVal;
                 node.visited = true;
-                steps.push({
+                emitStep(steps, {
                     node: node,
                     type: 'backtrack',
                     value: maxVal,
@@ -459,15 +1080,15 @@ html_code = """
                 return maxVal;
             } else {
                 let minVal = Infinity;
-                for (let child of node.children) {
-                    const val = alphaBeta(child, depth + 1, alpha, beta, true, steps);
+                for (let c = 0; c < node.children.length; c++) {
+                    const val = alphaBeta(node.children[c], depth + 1, alpha, beta, true, steps);
                     minVal = Math.min(minVal, val);
                     beta = Math.min(beta, val);
                     
                     if (beta <= alpha) {
-                        for (let i = node.children.indexOf(child) + 1; i < node.children.length; i++) {
-                            markPruned(node.children[i]);
-                            steps.push({
+                        for (let i = c + 1; i < node.children.length; i++) {
+                            node.children[i].pruned = true;
+                            emitStep(steps, {
                                 node: node.children[i],
                                 type: 'prune',
                                 alpha: alpha,
@@ -479,7 +1100,7 @@ html_code = """
                 }
                 node.value = minVal;
                 node.visited = true;
-                steps.push({
+                emitStep(steps, {
                     node: node,
                     type: 'backtrack',
                     value: minVal,
@@ -490,13 +1111,6 @@ html_code = """
             }
         }
 
-        function markPruned(node) {
-            node.pruned = true;
-            for (let child of node.children) {
-                markPruned(child);
-            }
-        }
-
         function calculatePositions(node, x, y, horizontalSpacing, level = 0) {
             node.x = x;
             node.y = y;
@@ -517,71 +1131,159 @@ html_code = """
             }
         }
 
+        // Node discs are pre-rendered once per state into an atlas and labels
+        // are cached as bitmaps keyed by text, so a frame is only drawImage calls
+        const NODE_RADIUS = 25;
+        const SPRITE_SIZE = NODE_RADIUS * 2 + 4;
+        const NODE_STATES = ['max', 'min', 'current', 'best', 'pruned'];
+        const NODE_FILLS = {
+            max: '#c8e6c9',
+            min: '#ffcdd2',
+            current: '#e3f2fd',
+            best: '#ffeb3b',
+            pruned: '#bdbdbd'
+        };
+        const TEXT_STYLES = {
+            value: { font: 'bold 14px sans-serif', color: '#134252', height: 18 },
+            bound: { font: '10px monospace', color: '#626f78', height: 14 }
+        };
+        const PRUNED_ALPHA = 0.3;
+        const MAX_TEXT_SPRITES = 512;
+        let nodeAtlas = null;
+        // Least recently used first, so the oldest bitmap is evicted when full
+        const textSprites = new Map();
+
+        function createSpriteCanvas(width, height) {
+            const sprite = document.createElement('canvas');
+            sprite.width = width;
+            sprite.height = height;
+            return sprite;
+        }
+
+        function buildNodeAtlas() {
+            const atlas = createSpriteCanvas(SPRITE_SIZE * NODE_STATES.length, SPRITE_SIZE);
+            const atlasCtx = atlas.getContext('2d');
+            atlasCtx.strokeStyle = '#134252';
+            atlasCtx.lineWidth = 2;
+            NODE_STATES.forEach((state, i) => {
+                atlasCtx.fillStyle = NODE_FILLS[state];
+                atlasCtx.beginPath();
+                atlasCtx.arc(i * SPRITE_SIZE + SPRITE_SIZE / 2, SPRITE_SIZE / 2, NODE_RADIUS, 0, Math.PI * 2);
+                atlasCtx.fill();
+                atlasCtx.stroke();
+            });
+            return atlas;
+        }
+
+        function textSprite(text, styleName) {
+            const key = styleName + ':' + text;
+            let sprite = textSprites.get(key);
+            if (sprite) {
+                textSprites.delete(key);
+            } else {
+                const style = TEXT_STYLES[styleName];
+                ctx.font = style.font;
+                sprite = createSpriteCanvas(Math.ceil(ctx.measureText(text).width) + 2, style.height);
+                const spriteCtx = sprite.getContext('2d');
+                spriteCtx.font = style.font;
+                spriteCtx.fillStyle = style.color;
+                spriteCtx.textAlign = 'center';
+                spriteCtx.textBaseline = 'middle';
+                spriteCtx.fillText(text, sprite.width / 2, sprite.height / 2);
+                if (textSprites.size >= MAX_TEXT_SPRITES) {
+                    textSprites.delete(textSprites.keys().next().value);
+                }
+            }
+            textSprites.set(key, sprite);
+            return sprite;
+        }
+
+        function blitText(text, styleName, x, y) {
+            const sprite = textSprite(text, styleName);
+            ctx.drawImage(sprite, Math.round(x - sprite.width / 2), Math.round(y - sprite.height / 2));
+        }
+
+        function nodeState(node, highlightNode, pruned) {
+            if (pruned) return 'pruned';
+            if (node.isBestPath) return 'best';
+            if (node === highlightNode) return 'current';
+            return node.depth % 2 === 0 ? 'max' : 'min';
+        }
+
+        function drawNode(node, highlightNode, pruned) {
+            const state = NODE_STATES.indexOf(nodeState(node, highlightNode, pruned));
+            ctx.drawImage(
+                nodeAtlas,
+                state * SPRITE_SIZE, 0, SPRITE_SIZE, SPRITE_SIZE,
+                Math.round(node.x - SPRITE_SIZE / 2), Math.round(node.y - SPRITE_SIZE / 2), SPRITE_SIZE, SPRITE_SIZE
+            );
+
+            if (node.value !== null && node.visited) {
+                blitText(String(node.value), 'value', node.x, node.y);
+            }
+
+            if (!node.isLeaf && (node.alpha !== -Infinity || node.beta !== Infinity)) {
+                const alphaText = node.alpha === -Infinity ? '-∞' : node.alpha;
+                const betaText = node.beta === Infinity ? '∞' : node.beta;
+                blitText(`α:${alphaText}`, 'bound', node.x, node.y - 35);
+                blitText(`β:${betaText}`, 'bound', node.x, node.y + 35);
+            }
+        }
+
         function drawTree(highlightNode = null) {
+            const start = performance.now();
             ctx.clearRect(0, 0, canvas.width, canvas.height);
-            
-            function draw(node) {
+            if (!nodeAtlas) {
+                nodeAtlas = buildNodeAtlas();
+            }
+
+            // One path per edge style: [pruned][best path]
+            const edges = [[new Path2D(), new Path2D()], [new Path2D(), new Path2D()]];
+            const nodes = [];
+            const prunedNodes = [];
+
+            function collect(node, pruned) {
                 for (let child of node.children) {
-                    ctx.strokeStyle = child.pruned ? '#bdbdbd' : '#626f78';
-                    ctx.lineWidth = child.isBestPath ? 3 : 1;
-                    ctx.globalAlpha = child.pruned ? 0.3 : 1;
-                    ctx.beginPath();
-                    ctx.moveTo(node.x, node.y);
-                    ctx.lineTo(child.x, child.y);
-                    ctx.stroke();
-                    ctx.globalAlpha = 1;
-                    draw(child);
-                }
-                
-                const isMax = node.depth % 2 === 0;
-                let fillColor = isMax ? '#c8e6c9' : '#ffcdd2';
-                
-                if (node === highlightNode) {
-                    fillColor = '#e3f2fd';
+                    const childPruned = pruned || child.pruned;
+                    const path = edges[childPruned ? 1 : 0][child.isBestPath ? 1 : 0];
+                    path.moveTo(node.x, node.y);
+                    path.lineTo(child.x, child.y);
+                    collect(child, childPruned);
                 }
-                if (node.isBestPath) {
-                    fillColor = '#ffeb3b';
-                }
-                if (node.pruned) {
-                    fillColor = '#bdbdbd';
-                    ctx.globalAlpha = 0.3;
+                (pruned ? prunedNodes : nodes).push(node);
+            }
+
+            if (tree) {
+                collect(tree, tree.pruned);
+
+                for (let pruned = 0; pruned < 2; pruned++) {
+                    ctx.strokeStyle = pruned ? '#bdbdbd' : '#626f78';
+                    ctx.globalAlpha = pruned ? PRUNED_ALPHA : 1;
+                    for (let best = 0; best < 2; best++) {
+                        ctx.lineWidth = best ? 3 : 1;
+                        ctx.stroke(edges[pruned][best]);
+                    }
                 }
-                
-                ctx.fillStyle = fillColor;
-                ctx.beginPath();
-                ctx.arc(node.x, node.y, 25, 0, Math.PI * 2);
-                ctx.fill();
-                ctx.strokeStyle = '#134252';
-                ctx.lineWidth = 2;
-                ctx.stroke();
-                
-                ctx.fillStyle = '#134252';
-                ctx.font = 'bold 14px sans-serif';
-                ctx.textAlign = 'center';
-                ctx.textBaseline = 'middle';
-                
-                if (node.value !== null && node.visited) {
-                    ctx.fillText(node.value, node.x, node.y);
+
+                ctx.globalAlpha = 1;
+                for (let node of nodes) {
+                    drawNode(node, highlightNode, false);
                 }
-                
-                if (!node.isLeaf && (node.alpha !== -Infinity || node.beta !== Infinity)) {
-                    ctx.font = '10px monospace';
-                    ctx.fillStyle = '#626f78';
-                    const alphaText = node.alpha === -Infinity ? '-∞' : node.alpha;
-                    const betaText = node.beta === Infinity ? '∞' : node.beta;
-                    ctx.fillText(`α:${alphaText}`, node.x, node.y - 35);
-                    ctx.fillText(`β:${betaText}`, node.x, node.y + 35);
+                ctx.globalAlpha = PRUNED_ALPHA;
+                for (let node of prunedNodes) {
+                    drawNode(node, highlightNode, true);
                 }
-                
                 ctx.globalAlpha = 1;
             }
-            
-            if (tree) {
-                draw(tree);
-            }
+
+            const duration = performance.now() - start;
+            perf.frameTimes.push(duration);
+            recordPhase('draw', start, duration);
         }
 
         function countNodes(node) {
+            // Nothing below a pruned subtree root is ever visited
+            if (node.pruned) return 0;
             let count = node.visited ? 1 : 0;
             for (let child of node.children) {
                 count += countNodes(child);
@@ -590,7 +1292,8 @@ html_code = """
         }
 
         function countPruned(node) {
-            let count = node.pruned ? 1 : 0;
+            if (node.pruned) return node.size;
+            let count = 0;
             for (let child of node.children) {
                 count += countPruned(child);
             }
@@ -598,22 +1301,28 @@ html_code = """
         }
 
         function initializeTree() {
-            const values = treeValuesInput.value.split(',').map(v => parseInt(v.trim()));
-            tree = buildTree(values);
+            importGeneration++;
+            traceLoading = false;
+            leafValues = treeValuesInput.value.split(',').map(v => parseInt(v.trim()));
+            resetPerf();
+            perf.traceBytes = TRACE_HEADER_SIZE + encodedLeavesSize(leafValues);
+            tree = timed('build', () => buildTree(leafValues));
             
             canvas.width = 1200;
             canvas.height = 400;
             
-            calculatePositions(tree, canvas.width / 2, 50, 600);
+            timed('layout', () => calculatePositions(tree, canvas.width / 2, 50, 600));
             drawTree();
             
             currentStep = 0;
             animationSteps = [];
+            document.getElementById('exportTrace').disabled = true;
             
             document.getElementById('nodesEvaluated').textContent = '0';
             document.getElementById('nodesPruned').textContent = '0';
             document.getElementById('bestValue').textContent = '-';
             document.getElementById('efficiency').textContent = '-';
+            updateProfile();
         }
 
         function updateStats(isAlphaBeta = false) {
@@ -629,26 +1338,58 @@ html_code = """
                 const efficiency = ((pruned / totalNodes) * 100).toFixed(1) + '%';
                 document.getElementById('efficiency').textContent = efficiency;
             }
+            updateProfile();
         }
 
-        document.getElementById('runMinimax').addEventListener('click', () => {
-            initializeTree();
-            animationSteps = [];
-            minimax(tree, 0, true, animationSteps);
+        function startAnimation(isAlphaBeta) {
+            traceIsAlphaBeta = isAlphaBeta;
             currentStep = 0;
             isAnimating = true;
             document.getElementById('stepBtn').disabled = false;
-            playAnimation(false);
+            document.getElementById('exportTrace').disabled = false;
+            playAnimation(isAlphaBeta);
+        }
+
+        document.getElementById('runMinimax').addEventListener('click', () => {
+            initializeTree();
+            animationSteps = [];
+            runSearch(() => minimax(tree, 0, true, animationSteps));
+            startAnimation(false);
         });
 
         document.getElementById('runAlphaBeta').addEventListener('click', () => {
             initializeTree();
             animationSteps = [];
-            alphaBeta(tree, 0, -Infinity, Infinity, true, animationSteps);
-            currentStep = 0;
-            isAnimating = true;
-            document.getElementById('stepBtn').disabled = false;
-            playAnimation(true);
+            runSearch(() => alphaBeta(tree, 0, -Infinity, Infinity, true, animationSteps));
+            startAnimation(true);
+        });
+
+        document.getElementById('exportTrace').addEventListener('click', async () => {
+            try {
+                const compress = document.getElementById('compressTrace').checked;
+                const bytes = await encodeTrace(leafValues, animationSteps, traceIsAlphaBeta, compress);
+                downloadBlob(
+                    traceIsAlphaBeta ? 'alpha-beta.mmvt' : 'minimax.mmvt',
+                    new Blob([bytes], { type: 'application/octet-stream' })
+                );
+            } catch (e) {
+                alert(e.message);
+            }
+        });
+
+        document.getElementById('importTrace').addEventListener('click', () => {
+            document.getElementById('traceFile').click();
+        });
+
+        document.getElementById('traceFile').addEventListener('change', async (event) => {
+            const file = event.target.files[0];
+            event.target.value = '';
+            if (!file) return;
+            try {
+                await importTrace(new Uint8Array(await file.arrayBuffer()));
+            } catch (e) {
+                alert(e.message);
+            }
         });
 
         document.getElementById('stepBtn').addEventListener('click', () => {
@@ -675,6 +1416,31 @@ html_code = """
             initializeTree();
         });
 
+        document.getElementById('exportProfile').addEventListener('click', () => {
+            downloadJSON('minimax-profile.json', profileSummary());
+        });
+
+        document.getElementById('exportChromeTrace').addEventListener('click', () => {
+            const summary = profileSummary();
+            const counters = {
+                name: 'counters',
+                ph: 'C',
+                ts: Math.round(performance.now() * 1000),
+                pid: 1,
+                tid: 1,
+                args: {
+                    nodesPerSec: summary.nodesPerSec || 0,
+                    traceBytes: summary.traceBytes,
+                    nodesAllocated: summary.allocations.nodes,
+                    stepsAllocated: summary.allocations.steps
+                }
+            };
+            downloadJSON('minimax-trace.json', {
+                traceEvents: perf.events.concat([counters]),
+                displayTimeUnit: 'ms'
+            });
+        });
+
         function executeStep(step) {
             // Step execution is already handled by the algorithm
         }
@@ -683,6 +1449,8 @@ html_code = """
             let stepIndex = 0;
             const interval = setInterval(() => {
                 if (stepIndex >= animationSteps.length) {
+                    // An imported trace may still be decoding its later blocks
+                    if (traceLoading) return;
                     clearInterval(interval);
                     updateStats(isAlphaBeta);
                     document.getElementById('stepBtn').disabled = true;
@@ -697,11 +1465,38 @@ html_code = """
         }
 
         initializeTree();
+
+        if (OFFLINE_TRACE) {
+            importTrace(base64ToBytes(OFFLINE_TRACE)).catch(e => alert(e.message));
+        }
     </script>
 </body>
 </html>
 """
 
+if trace_path:
+    try:
+        # Only the selected prefix of blocks is copied out of the mapping and sent
+        with open(trace_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            leaves_end, blocks = index_trace(mm)
+            block_count = len(blocks)
+            if block_count > 1:
+                block_count = st.sidebar.slider(
+                    "Blocks to replay",
+                    1, len(blocks), 1,
+                    help=f"Each block holds up to {TRACE_BLOCK_SIZE} steps."
+                )
+            replayed = sum(steps for _, _, steps in blocks[:block_count])
+            total = sum(steps for _, _, steps in blocks)
+            st.sidebar.caption(f"Replaying {replayed:,} of {total:,} steps")
+            trace = trace_window(mm, leaves_end, blocks, block_count)
+        html_code = html_code.replace(
+            "const OFFLINE_TRACE = null;",
+            f'const OFFLINE_TRACE = "{base64.b64encode(trace).decode("ascii")}";'
+        )
+    except (OSError, ValueError) as e:
+        st.sidebar.error(f"Could not load trace: {e}")
+
 # Embed the HTML visualization
 components.html(html_code, height=800, scrolling=True)
 
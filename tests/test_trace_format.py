@@ -0,0 +1,95 @@
+import mmap
+import re
+from pathlib import Path
+
+import pytest
+
+from trace_format import (
+    TRACE_BLOCK_SIZE,
+    TRACE_FLAGS,
+    TRACE_HEADER_SIZE,
+    TRACE_MAGIC,
+    TRACE_VERSION,
+    index_trace,
+    trace_window,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+APP = Path(__file__).parent.parent / "app.py"
+
+# Exported by the visualizer: the default tree searched with alpha-beta
+# (compressed), and a 2048-leaf minimax search (uncompressed, two blocks)
+ALPHA_BETA_SPANS = (26, [(26, 137, 43)])
+MINIMAX_SPANS = (2060, [(2060, 19735, 4096), (19735, 28558, 2046)])
+
+
+def read_fixture(name):
+    return (FIXTURES / name).read_bytes()
+
+
+@pytest.mark.parametrize("name, spans", [
+    ("alpha_beta.mmvt", ALPHA_BETA_SPANS),
+    ("minimax_blocks.mmvt", MINIMAX_SPANS),
+])
+def test_index_trace(name, spans):
+    assert index_trace(read_fixture(name)) == spans
+
+
+def test_index_trace_memory_mapped():
+    with open(FIXTURES / "minimax_blocks.mmvt", "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        assert index_trace(mm) == MINIMAX_SPANS
+
+
+@pytest.mark.parametrize("block_count", [0, 1, 2])
+def test_trace_window(block_count):
+    data = read_fixture("minimax_blocks.mmvt")
+    leaves_end, blocks = index_trace(data)
+    window = trace_window(data, leaves_end, blocks, block_count)
+    assert index_trace(window) == (leaves_end, blocks[:block_count])
+    assert window[:-1] == data[:len(window) - 1]
+
+
+def with_byte(data, index, value):
+    data = bytearray(data)
+    data[index] = value
+    return bytes(data)
+
+
+@pytest.mark.parametrize("corrupt, message", [
+    (lambda data: b"XXXX" + data[4:], "Not a minimax trace file"),
+    (lambda data: data[:6], "Not a minimax trace file"),
+    (lambda data: with_byte(data, 4, TRACE_VERSION + 1), "Unsupported trace version"),
+    (lambda data: with_byte(data, 5, data[5] | 0x10), "Unknown trace flags"),
+    (lambda data: with_byte(data, 7, 1), "reserved bytes"),
+    (lambda data: data[:-1], "truncated"),
+    (lambda data: data[:30], "truncated"),
+    (lambda data: data + b"\x00", "trailing data"),
+])
+def test_index_trace_rejects_malformed(corrupt, message):
+    with pytest.raises(ValueError, match=message):
+        index_trace(corrupt(read_fixture("alpha_beta.mmvt")))
+
+
+@pytest.mark.parametrize("values", [[], [5]])
+def test_index_trace_rejects_too_few_leaves(values):
+    leaves = bytes([len(values)] + [v * 2 for v in values])
+    data = TRACE_MAGIC + bytes([TRACE_VERSION, 0, 0, 0, len(leaves)]) + leaves + b"\x00"
+    with pytest.raises(ValueError, match="at least two leaves"):
+        index_trace(data)
+
+
+def js_constant(source, name):
+    return re.search(rf"const {name} = (.+);", source).group(1)
+
+
+def test_constants_match_visualizer():
+    source = APP.read_text(encoding="utf-8")
+    magic = [int(b, 16) for b in re.findall(r"0x([0-9a-f]+)", js_constant(source, "TRACE_MAGIC"))]
+    assert bytes(magic) == TRACE_MAGIC
+    assert int(js_constant(source, "TRACE_VERSION")) == TRACE_VERSION
+    assert int(js_constant(source, "TRACE_HEADER_SIZE")) == TRACE_HEADER_SIZE
+    assert int(js_constant(source, "TRACE_BLOCK_SIZE")) == TRACE_BLOCK_SIZE
+    flags = int(js_constant(source, "FLAG_COMPRESSED")) | int(js_constant(source, "FLAG_ALPHA_BETA"))
+    assert js_constant(source, "TRACE_FLAGS") == "FLAG_COMPRESSED | FLAG_ALPHA_BETA"
+    assert flags == TRACE_FLAGS
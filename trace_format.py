@@ -0,0 +1,76 @@
+"""Reading and slicing binary search traces (.mmvt) exported by the visualizer.
+
+The layout is documented next to the encoder in the visualizer script in
+app.py; the constants here must match the ones defined there.
+"""
+
+TRACE_MAGIC = b"MMVT"
+TRACE_VERSION = 1
+TRACE_HEADER_SIZE = 8
+TRACE_FLAGS = 0b11  # compressed, alpha-beta
+TRACE_BLOCK_SIZE = 4096
+
+
+def read_varint(buf, offset, end=None):
+    """Read a varint from ``buf`` at ``offset`` and return it with the next offset.
+
+    Reading stops at ``end`` (default: the end of ``buf``).
+    """
+    end = len(buf) if end is None else end
+    value = 0
+    shift = 0
+    while True:
+        if offset >= end:
+            raise ValueError("Trace file is truncated")
+        b = buf[offset]
+        offset += 1
+        value |= (b & 0x7F) << shift
+        shift += 7
+        if not b & 0x80:
+            return value, offset
+
+
+def index_trace(buf):
+    """Validate a trace in place and return the end of its leaves and its block spans.
+
+    Only the header and the length prefixes are read, so indexing a
+    memory-mapped trace leaves the block payloads untouched. Each span is
+    ``(start, end, step_count)``.
+    """
+    if len(buf) < TRACE_HEADER_SIZE or buf[:4] != TRACE_MAGIC:
+        raise ValueError("Not a minimax trace file")
+    if buf[4] != TRACE_VERSION:
+        raise ValueError(f"Unsupported trace version {buf[4]} (expected {TRACE_VERSION})")
+    if buf[5] & ~TRACE_FLAGS:
+        raise ValueError(f"Unknown trace flags {buf[5]}")
+    if buf[6] or buf[7]:
+        raise ValueError("Trace header reserved bytes must be zero")
+
+    length, offset = read_varint(buf, TRACE_HEADER_SIZE)
+    leaves_end = offset + length
+    if leaves_end > len(buf):
+        raise ValueError("Trace file is truncated")
+    leaf_count, _ = read_varint(buf, offset, leaves_end)
+    if leaf_count < 2:
+        raise ValueError("Trace tree needs at least two leaves")
+    blocks = []
+    offset = leaves_end
+    while True:
+        start = offset
+        steps, offset = read_varint(buf, offset)
+        if steps == 0:
+            break
+        length, offset = read_varint(buf, offset)
+        offset += length
+        if offset > len(buf):
+            raise ValueError("Trace file is truncated")
+        blocks.append((start, offset, steps))
+    if offset != len(buf):
+        raise ValueError("Trace file has trailing data")
+    return leaves_end, blocks
+
+
+def trace_window(buf, leaves_end, blocks, block_count):
+    """Return a complete trace holding only the first ``block_count`` blocks."""
+    end = blocks[block_count - 1][1] if block_count else leaves_end
+    return buf[:end] + b"\x00"